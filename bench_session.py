@@ -0,0 +1,63 @@
+import argparse
+import json
+import random
+import string
+import time
+
+from session import ChatSession
+
+
+def random_text(rng: random.Random, size: int) -> str:
+    words = [
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10)))
+        for _ in range(size // 6)
+    ]
+    return " ".join(words)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Serialization time per turn, full json.dumps vs ChatSession"
+    )
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--message-size", type=int, default=2000, help="chars")
+    parser.add_argument("--every", type=int, default=50, help="print every n turns")
+
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    params = {"temperature": 0.7, "max_tokens": 1024}
+
+    messages = []
+    session = ChatSession(None, "model", **params)
+
+    print(
+        f"{'turn':>5}  {'size':>9}  {'json.dumps':>11}"
+        f"  {'size':>9}  {'encode':>9}  {'body':>9}"
+    )
+    for turn in range(1, args.turns + 1):
+        user = random_text(rng, args.message_size)
+        assistant = random_text(rng, args.message_size)
+
+        # What Local.chat_completion does every turn
+        start = time.perf_counter()
+        messages.append({"role": "user", "content": user})
+        full = json.dumps({"messages": messages, "model": "model", **params}).encode()
+        full_time = time.perf_counter() - start
+        messages.append({"role": "assistant", "content": assistant})
+
+        # Only the new message is encoded, body() copies the cached bytes
+        start = time.perf_counter()
+        session.add("user", user)
+        encode_time = time.perf_counter() - start
+        start = time.perf_counter()
+        body = session.body()
+        body_time = time.perf_counter() - start
+        session.add("assistant", assistant)
+
+        if turn % args.every == 0 or turn == 1:
+            print(
+                f"{turn:>5}  {len(full) / 1024:>7.0f}KB  {full_time * 1e3:>9.3f}ms"
+                f"  {len(body) / 1024:>7.0f}KB  {encode_time * 1e3:>7.3f}ms"
+                f"  {body_time * 1e3:>7.3f}ms"
+            )
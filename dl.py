@@ -2,6 +2,7 @@ import argparse
 import concurrent.futures
 import os
 import re
+import struct
 from pprint import pprint
 from subprocess import call
 from tempfile import TemporaryDirectory
@@ -11,14 +12,8 @@ import huggingface_hub as hf
 LOCAL_DIR = "/home/ubuntu/models"
 GGUF_PREF = ["Q4_K_M", "Q4_K_S"]
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
-    parser.add_argument("model", help="name of the model to download")
-
-    args = parser.parse_args()
-
-    model_or_url: str = args.model
 
+def parse_model_repo(model_or_url: str) -> str:
     # Check if model is a link or model only
     # https://huggingface.co/deepseek-ai/DeepSeek-R1 --> Huggingface model repo link
     # https://huggingface.co/bartowski/DeepSeek-R1-GGUF --> Huggingface model repo link (GGUF)
@@ -29,94 +24,132 @@ if __name__ == "__main__":
         match = re.search(pattern, model_or_url)
 
         if match:
-            model_repo = f"{match.group(1)}/{match.group(2)}"
-        else:
-            raise ValueError(f"Invalid link: {model_or_url}")
-    elif r"/" in model_or_url:
-        if len(model_or_url.split("/")) == 2:
-            model_repo = model_or_url
-        else:
-            raise ValueError(f"Invalid model: {model_or_url}")
+            return f"{match.group(1)}/{match.group(2)}"
+        raise ValueError(f"Invalid link: {model_or_url}")
 
-        pass
+    if len(model_or_url.split("/")) == 2:
+        return model_or_url
 
-    is_gguf = "gguf" in model_repo.lower()
+    raise ValueError(f"Invalid model: {model_or_url}")
 
-    print("Fetching file list...")
-    files = hf.list_repo_files(model_repo)
 
-    if is_gguf:
-        # Get preferred gguf
-        for _gguf in GGUF_PREF:
-            dl_files = [file for file in files if _gguf in file]
-
-            if dl_files:
-                break
-        else:
-            for file in files:
-                if file.endswith(".gguf"):
-                    dl_files = [file]
-            else:
-                raise ValueError("No valid GGUF file found!")
-
-        with TemporaryDirectory() as td:
-            f_path = os.path.join(td, "links.txt")
-            with open(f_path, "w") as f:
-                f.writelines(
-                    [
-                        f"https://huggingface.co/{model_repo}/resolve/main/{file}?download=true#{file}\n  out={file}\n"
-                        for file in dl_files
-                    ]
-                )
-
-            call(
-                [
-                    "aria2c",
-                    "-j",
-                    "16",
-                    "-s",
-                    "16",
-                    "-x",
-                    "16",
-                    "-c",
-                    "-k",
-                    "1M",
-                    "-d",
-                    f"{LOCAL_DIR}/{model_repo}",
-                    "-i",
-                    f_path,
-                ]
-            )
+def pick_gguf_files(files: list[str], gguf_pref: list[str]) -> list[str]:
+    # Get preferred gguf
+    for _gguf in gguf_pref:
+        dl_files = [file for file in files if _gguf in file]
+
+        if dl_files:
+            return dl_files
+
+    for file in files:
+        if file.endswith(".gguf"):
+            return [file]
+
+    raise ValueError("No valid GGUF file found!")
+
 
-    else:
-        if not os.path.exists(f"{LOCAL_DIR}/{model_repo}"):
-            os.makedirs(f"{LOCAL_DIR}/{model_repo}", exist_ok=True)
-
-        with TemporaryDirectory() as td:
-            f_path = os.path.join(td, "links.txt")
-            with open(f_path, "w") as f:
-                f.writelines(
-                    [
-                        f"https://huggingface.co/{model_repo}/resolve/main/{file}?download=true#{file}\n  out={file}\n"
-                        for file in files
-                    ]
-                )
-
-            call(
+def aria2c(model_repo: str, files: list[str]):
+    if not os.path.exists(f"{LOCAL_DIR}/{model_repo}"):
+        os.makedirs(f"{LOCAL_DIR}/{model_repo}", exist_ok=True)
+
+    with TemporaryDirectory() as td:
+        f_path = os.path.join(td, "links.txt")
+        with open(f_path, "w") as f:
+            f.writelines(
                 [
-                    "aria2c",
-                    "-j",
-                    "16",
-                    "-s",
-                    "16",
-                    "-x",
-                    "16",
-                    "-c",
-                    "-k",
-                    "1M",
-                    "-d",
-                    f"{LOCAL_DIR}/{model_repo}",
-                    "-i",
-                    f_path,
+                    f"https://huggingface.co/{model_repo}/resolve/main/{file}?download=true#{file}\n  out={file}\n"
+                    for file in files
                 ]
             )
+
+        return call(
+            [
+                "aria2c",
+                "-j",
+                "16",
+                "-s",
+                "16",
+                "-x",
+                "16",
+                "-c",
+                "-k",
+                "1M",
+                "-d",
+                f"{LOCAL_DIR}/{model_repo}",
+                "-i",
+                f_path,
+            ]
+        )
+
+
+def download(model_repo: str, gguf_pref: list[str] = GGUF_PREF):
+    is_gguf = "gguf" in model_repo.lower()
+
+    print(f"Fetching file list for {model_repo}...")
+    files = hf.list_repo_files(model_repo)
+
+    if is_gguf:
+        files = pick_gguf_files(files, gguf_pref)
+
+    code = aria2c(model_repo, files)
+
+    if is_gguf and code == 0:
+        check_gguf_quants(model_repo, files, gguf_pref)
+
+    return code
+
+
+def check_gguf_quants(model_repo: str, files: list[str], gguf_pref: list[str]):
+    """File names can lie, check the quant type in the GGUF header."""
+    import modelmeta
+
+    for file in files:
+        path = os.path.join(LOCAL_DIR, model_repo, file)
+        try:
+            quant_type = modelmeta.read_gguf(path)["quant_type"]
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Could not read the header of {file}: {e}")
+            continue
+
+        if quant_type is not None and quant_type not in gguf_pref:
+            print(f"Warning: {file} is {quant_type}, wanted one of {gguf_pref}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("model", help="name of the model to download")
+    parser.add_argument(
+        "--quant",
+        action="append",
+        help=f"GGUF quant to download, can be repeated (default: {GGUF_PREF})",
+    )
+    parser.add_argument(
+        "--preset",
+        help="also download the draft model of this preset (see presets.py), "
+        "'auto' for the best measured one",
+    )
+
+    args = parser.parse_args()
+
+    model_repo = parse_model_repo(args.model)
+    download(model_repo, args.quant or GGUF_PREF)
+
+    if args.preset is not None:
+        import presets
+        from launcher import find_models
+
+        # Presets and bench results use the names vllm_script.sh lists
+        repo_dir = os.path.join(LOCAL_DIR, model_repo)
+        drafts = set()
+        for model in find_models(repo_dir):
+            preset = presets.resolve(model["name"], args.preset, model["path"])
+            if preset is None:
+                print(f"{model['name']}: no preset measured faster than the baseline")
+                continue
+
+            print(f"{model['name']}: using preset {preset['name']}")
+            if preset["draft_repo"] and preset["draft_repo"] != "[ngram]":
+                drafts.add(preset["draft_repo"])
+
+        for draft in sorted(drafts):
+            download(draft)
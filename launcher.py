@@ -0,0 +1,437 @@
+import fnmatch
+import functools
+import os
+import re
+import shlex
+import sys
+from typing import Optional, TypedDict
+
+# argparse, json, logging, subprocess and threading are imported where they
+# are used, `list` and `show` run on every menu screen of vllm_script.sh and
+# must start fast
+
+MODEL_PATH = "/home/ubuntu/models"
+CONFIG_PATH = "/home/ubuntu/configs"
+COMMON_CONFIG_PATH = "/home/ubuntu/vllm_server_scripts/common.conf"
+VALID_ARGS_FILE = "/home/ubuntu/vllm_server_scripts/VLLM_VALID_ARGS.txt"
+
+LOG_FILE = "/home/ubuntu/vllm.log"
+LOG_MAX_BYTES = 50 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+HEALTH_TIMEOUT = 900  # seconds for an instance to load
+
+
+# # TYPES
+
+
+class Option(TypedDict, total=True):
+    name: str
+    # One entry per config line of the option, repeatable vllm flags like
+    # `middleware` can be given on several lines
+    values: list[Optional[str]]  # as written, None for flags without a value
+    args: list[list[str]]  # values split like the shell would
+    source: str  # config file the option came from
+    valid: bool  # listed in VLLM_VALID_ARGS.txt
+
+
+class Model(TypedDict, total=True):
+    name: str
+    path: str
+
+
+# # CONFIGS
+
+
+@functools.cache
+def load_valid_args(path: str = VALID_ARGS_FILE) -> frozenset[str]:
+    with open(path) as f:
+        return frozenset(line.strip() for line in f if line.strip())
+
+
+def config_of(model: str) -> str:
+    # org/Model-7B.Q4_K_M.gguf -> org_Model-7B_Q4_K_M_gguf
+    return os.path.join(CONFIG_PATH, re.sub(r"[/.]+", "_", model))
+
+
+def split_value(value: str) -> list[str]:
+    """`a=/x b=/y` -> ['a=/x', 'b=/y'], `'{"k": 1}'` -> ['{"k": 1}']"""
+    try:
+        return shlex.split(value)
+    except ValueError:
+        # Unbalanced quotes, split on whitespace like bash did
+        return value.split()
+
+
+def parse_config(
+    path: str, valid_args: Optional[frozenset[str]] = None
+) -> dict[str, Option]:
+    """Parse a config file of `name value` lines, repeated names keep every line."""
+    if valid_args is None:
+        valid_args = load_valid_args()
+
+    options: dict[str, Option] = {}
+    if not os.path.exists(path):
+        return options
+
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            # Any whitespace, like `--$line` did in bash
+            parts = line.split(None, 1)
+            name = parts[0].removeprefix("--")
+            value = parts[1] if len(parts) > 1 else ""
+
+            opt = options.setdefault(
+                name,
+                {
+                    "name": name,
+                    "values": [],
+                    "args": [],
+                    "source": path,
+                    "valid": name in valid_args,
+                },
+            )
+            opt["values"].append(value or None)
+            opt["args"].append(split_value(value))
+    return options
+
+
+def merged_options(model: str) -> dict[str, Option]:
+    """Options of `common.conf`, each overridden (all lines) by the model config."""
+    valid_args = load_valid_args()
+    return {
+        **parse_config(COMMON_CONFIG_PATH, valid_args),
+        **parse_config(config_of(model), valid_args),
+    }
+
+
+def to_argv(options: dict[str, list[str]]) -> list[str]:
+    argv = []
+    for name, args in options.items():
+        argv.append(f"--{name}")
+        argv.extend(args)
+    return argv
+
+
+def options_argv(options: dict[str, Option]) -> list[str]:
+    argv = []
+    for name, opt in options.items():
+        for args in opt["args"]:
+            argv.append(f"--{name}")
+            argv.extend(args)
+    return argv
+
+
+def build_argv(model_path: str, options: dict[str, Option]) -> list[str]:
+    # VLLM_VALID_ARGS.txt is a snapshot, newer vllm may know more arguments
+    unknown = [name for name, opt in options.items() if not opt["valid"]]
+    if unknown:
+        print(
+            f"Warning: not in {VALID_ARGS_FILE}: {', '.join(unknown)}",
+            file=sys.stderr,
+        )
+
+    return ["vllm", "serve", model_path, *options_argv(options)]
+
+
+# # MODELS
+
+
+def find_models(path: str = MODEL_PATH) -> list[Model]:
+    """Same listing as add_models_to_list used to build in vllm_script.sh."""
+    models: list[Model] = []
+
+    def real(entry: os.DirEntry, real_d: str) -> str:
+        # realpath is a syscall per path component, only symlinks need it
+        if entry.is_symlink():
+            return os.path.realpath(entry.path)
+        return os.path.join(real_d, entry.name)
+
+    def walk(d: str, real_d: str):
+        try:
+            entries = sorted(os.scandir(d), key=lambda e: e.name)
+        except OSError:
+            return
+
+        for entry in entries:
+            if entry.is_dir():
+                walk(entry.path, real(entry, real_d))
+            elif fnmatch.fnmatch(entry.name, "model*.safetensors"):
+                # One safetensors model per folder
+                d2 = os.path.dirname(real_d)
+                models.append(
+                    {
+                        "name": f"{os.path.basename(d2)}/{os.path.basename(real_d)}",
+                        "path": real_d,
+                    }
+                )
+                return
+            elif entry.name.endswith(".gguf"):
+                models.append({"name": entry.name, "path": real(entry, real_d)})
+
+    walk(path, os.path.realpath(path))
+    return models
+
+
+def select_model(models: list[Model], query: str) -> Optional[Model]:
+    import shutil
+    import subprocess
+
+    by_name = {m["name"]: m for m in models}
+
+    if shutil.which("fzf"):
+        sel = subprocess.run(
+            ["fzf", "--query", query, "--select-1", "--exit-0"],
+            input="\n".join(by_name),
+            stdout=subprocess.PIPE,
+            text=True,
+        ).stdout.strip()
+        return by_name.get(sel)
+
+    query = query.lower()
+    for m in models:
+        if query in m["name"].lower():
+            return m
+    return None
+
+
+# # SERVE
+
+
+def file_logger(name: str, log_file: str = LOG_FILE) -> "logging.Logger":
+    import logging
+    import logging.handlers
+
+    handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    return logger
+
+
+def serve(model: Model, options: dict[str, Option], log: bool = True) -> int:
+    import subprocess
+
+    argv = build_argv(model["path"], options)
+    print(f"Running: {' '.join(argv)}", flush=True)
+
+    env = {**os.environ, "MODEL": model["path"]}
+
+    if not log:
+        return subprocess.call(argv, env=env)
+
+    logger = file_logger("vllm_serve")
+
+    proc = subprocess.Popen(
+        argv,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        bufsize=1,
+    )
+    assert proc.stdout is not None
+    try:
+        for line in proc.stdout:
+            sys.stdout.write(line)
+            logger.info(line.rstrip("\n"))
+    except KeyboardInterrupt:
+        proc.terminate()
+    return proc.wait()
+
+
+def wait_healthy(proc, port: int, timeout: float = HEALTH_TIMEOUT) -> bool:
+    """Wait for `/health` of a starting instance, False if it exited or timed out."""
+    import time
+    import urllib.request
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            return False
+        try:
+            with urllib.request.urlopen(
+                f"http://localhost:{port}/health", timeout=2
+            ) as resp:
+                if resp.status == 200:
+                    return True
+        except OSError:
+            pass
+        time.sleep(2)
+    return False
+
+
+def run_plans(plans: list[dict], host: Optional[str] = None) -> int:
+    """Start the launch plans of planner.py for this host and wait for all of them.
+
+    `host` defaults to this machine, unless every plan is for the same host.
+    Instances start one after the other, each once the previous one is healthy,
+    so the memory profiling of vllm at startup never overlaps on a GPU.
+    Each instance logs to its own rotating `LOG_FILE.<port>`, Ctrl-C stops all.
+    """
+    import socket
+    import subprocess
+    import threading
+
+    hosts = {plan["host"] for plan in plans}
+    if host is None:
+        host = hosts.pop() if len(hosts) == 1 else socket.gethostname()
+
+    local = [plan for plan in plans if plan["host"] == host]
+    if not local:
+        print(f"No plans for {host}, plans are for: {', '.join(sorted(hosts))}")
+        return 1
+
+    procs: list[subprocess.Popen] = []
+    pumps: list[threading.Thread] = []
+
+    try:
+        for plan in local:
+            print(f"Running on :{plan['port']}: {' '.join(plan['argv'])}", flush=True)
+            proc = subprocess.Popen(
+                plan["argv"],
+                env={**os.environ, **plan["env"]},
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                bufsize=1,
+            )
+
+            logger = file_logger(
+                f"vllm_serve.{plan['port']}", f"{LOG_FILE}.{plan['port']}"
+            )
+
+            def pump(proc=proc, logger=logger):
+                assert proc.stdout is not None
+                for line in proc.stdout:
+                    logger.info(line.rstrip("\n"))
+
+            pump_thread = threading.Thread(target=pump, daemon=True)
+            pump_thread.start()
+            procs.append(proc)
+            pumps.append(pump_thread)
+
+            if not wait_healthy(proc, plan["port"]):
+                print(f"{plan['name']} on :{plan['port']} did not become healthy")
+
+        codes = [proc.wait() for proc in procs]
+    except KeyboardInterrupt:
+        for proc in procs:
+            proc.terminate()
+        codes = [proc.wait() for proc in procs]
+
+    for pump_thread in pumps:
+        pump_thread.join(timeout=5)
+    return max(codes, default=0)
+
+
+def print_models(models: list[Model]):
+    for m in models:
+        print(f"{m['name']}\t{m['path']}")
+
+
+def print_config(path: str):
+    options = parse_config(path)
+    if not options:
+        print("  (Defaults)")
+        return
+
+    for opt in options.values():
+        for value in opt["values"]:
+            line = opt["name"]
+            if value is not None:
+                line += f" {value}"
+            if not opt["valid"]:
+                line += " (UNKNOWN ARGUMENT!!!)"
+            print(f"  {line}")
+
+
+if __name__ == "__main__":
+    # The menu screens of vllm_script.sh, without the ~10 ms of importing
+    # argparse and building the parser
+    if len(sys.argv) == 3 and sys.argv[1] == "show":
+        print_config(sys.argv[2])
+        sys.exit()
+    if len(sys.argv) == 4 and sys.argv[1:3] == ["list", "--show"]:
+        print_models(find_models())
+        print()
+        print_config(sys.argv[3])
+        sys.exit()
+
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="cmd", required=True)
+
+    p_list = subparsers.add_parser("list", help="list models as <name>\\t<path> lines")
+    p_list.add_argument(
+        "--show",
+        metavar="CONFIG",
+        help="then an empty line and this config, the first menu screen in one run",
+    )
+
+    p_show = subparsers.add_parser("show", help="print a config file")
+    p_show.add_argument("config", help="path of the config file")
+
+    p_select = subparsers.add_parser("select", help="pick a model with fzf")
+    p_select.add_argument("query", nargs="?", default="", help="fzf query")
+
+    p_serve = subparsers.add_parser("serve", help="serve a model")
+    p_serve.add_argument("query", nargs="?", default="", help="fzf query")
+    p_serve.add_argument("--model", help="exact model name, skips fzf")
+    p_serve.add_argument(
+        "--no-log", action="store_true", help=f"do not log to {LOG_FILE}"
+    )
+
+    p_plans = subparsers.add_parser("run-plans", help="run launch plans of planner.py")
+    p_plans.add_argument("plans", help="json file written by planner.py -o")
+    p_plans.add_argument(
+        "--host", help="run the plans of this host (default: this machine)"
+    )
+
+    args = parser.parse_args()
+
+    if args.cmd == "list":
+        print_models(find_models())
+        if args.show is not None:
+            print()
+            print_config(args.show)
+
+    elif args.cmd == "show":
+        print_config(args.config)
+
+    elif args.cmd == "select":
+        model = select_model(find_models(), args.query)
+        if model is None:
+            sys.exit(1)
+        print(f"{model['name']}\t{model['path']}")
+
+    elif args.cmd == "serve":
+        models = find_models()
+        if args.model is not None:
+            model = next((m for m in models if m["name"] == args.model), None)
+        else:
+            model = select_model(models, args.query)
+
+        if model is None:
+            sys.exit("No model selected")
+
+        options = merged_options(model["name"])
+        print(f"Model: {model['name']}")
+        print_config(config_of(model["name"]))
+        sys.exit(serve(model, options, log=not args.no_log))
+
+    elif args.cmd == "run-plans":
+        import json
+
+        with open(args.plans) as f:
+            sys.exit(run_plans(json.load(f), args.host))
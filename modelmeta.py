@@ -0,0 +1,424 @@
+import argparse
+import concurrent.futures
+import fnmatch
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+from collections import Counter
+from typing import Any, Literal, Optional, TypedDict
+
+from launcher import MODEL_PATH, Model, find_models
+
+# # TYPES
+
+
+class ModelMeta(TypedDict, total=True):
+    name: str
+    path: str
+    format: Literal["gguf", "safetensors"]
+    architecture: Optional[str]
+    quant_type: Optional[str]  # GGUF file type, or the dtype most weights use
+    parameter_count: int
+    tensor_count: int
+    size_bytes: int
+    context_length: Optional[int]
+    num_layers: Optional[int]
+    num_attention_heads: Optional[int]
+    num_kv_heads: Optional[int]
+    head_dim: Optional[int]
+
+
+# # GGUF
+
+GGUF_MAGIC = b"GGUF"
+
+# ggml_type -> name
+GGML_TYPES = {
+    0: "F32",
+    1: "F16",
+    2: "Q4_0",
+    3: "Q4_1",
+    6: "Q5_0",
+    7: "Q5_1",
+    8: "Q8_0",
+    9: "Q8_1",
+    10: "Q2_K",
+    11: "Q3_K",
+    12: "Q4_K",
+    13: "Q5_K",
+    14: "Q6_K",
+    15: "Q8_K",
+    16: "IQ2_XXS",
+    17: "IQ2_XS",
+    18: "IQ3_XXS",
+    19: "IQ1_S",
+    20: "IQ4_NL",
+    21: "IQ3_S",
+    22: "IQ2_S",
+    23: "IQ4_XS",
+    24: "I8",
+    25: "I16",
+    26: "I32",
+    27: "I64",
+    28: "F64",
+    29: "IQ1_M",
+    30: "BF16",
+}
+
+# general.file_type (llama_ftype) -> name, as used in GGUF file names
+GGUF_FILE_TYPES = {
+    0: "F32",
+    1: "F16",
+    2: "Q4_0",
+    3: "Q4_1",
+    7: "Q8_0",
+    8: "Q5_0",
+    9: "Q5_1",
+    10: "Q2_K",
+    11: "Q3_K_S",
+    12: "Q3_K_M",
+    13: "Q3_K_L",
+    14: "Q4_K_S",
+    15: "Q4_K_M",
+    16: "Q5_K_S",
+    17: "Q5_K_M",
+    18: "Q6_K",
+    19: "IQ2_XXS",
+    20: "IQ2_XS",
+    21: "Q2_K_S",
+    22: "IQ3_XS",
+    23: "IQ3_XXS",
+    24: "IQ1_S",
+    25: "IQ4_NL",
+    26: "IQ3_S",
+    27: "IQ3_M",
+    28: "IQ2_S",
+    29: "IQ2_M",
+    30: "IQ4_XS",
+    31: "IQ1_M",
+    32: "BF16",
+}
+
+# GGUF metadata value type -> struct format, for fixed size scalars
+GGUF_SCALARS = {
+    0: "<B",
+    1: "<b",
+    2: "<H",
+    3: "<h",
+    4: "<I",
+    5: "<i",
+    6: "<f",
+    7: "<?",
+    10: "<Q",
+    11: "<q",
+    12: "<d",
+}
+GGUF_STRING = 8
+GGUF_ARRAY = 9
+
+
+class GGUFReader:
+    """Reads the metadata and tensor table of a memory-mapped GGUF file."""
+
+    def __init__(self, buf: mmap.mmap) -> None:
+        self.buf = buf
+        self.pos = 0
+
+    def unpack(self, fmt: str):
+        value = struct.unpack_from(fmt, self.buf, self.pos)[0]
+        self.pos += struct.calcsize(fmt)
+        return value
+
+    def string(self) -> str:
+        n = self.unpack("<Q")
+        value = self.buf[self.pos : self.pos + n].decode("utf-8", errors="replace")
+        self.pos += n
+        return value
+
+    def skip_string(self):
+        n = self.unpack("<Q")
+        self.pos += n
+
+    def value(self, typ: int, keep: bool) -> Any:
+        """Read a metadata value, arrays are only skipped over unless `keep`."""
+        if typ in GGUF_SCALARS:
+            return self.unpack(GGUF_SCALARS[typ])
+
+        if typ == GGUF_STRING:
+            if keep:
+                return self.string()
+            self.skip_string()
+            return None
+
+        if typ == GGUF_ARRAY:
+            item_typ = self.unpack("<I")
+            count = self.unpack("<Q")
+
+            if keep:
+                return [self.value(item_typ, keep) for _ in range(count)]
+
+            if item_typ in GGUF_SCALARS:
+                self.pos += count * struct.calcsize(GGUF_SCALARS[item_typ])
+            else:
+                # e.g. the tokenizer vocabulary, walk the lengths only
+                for _ in range(count):
+                    self.value(item_typ, keep)
+            return None
+
+        raise ValueError(f"Unknown GGUF value type {typ} at offset {self.pos}")
+
+
+def read_gguf_header(path: str) -> tuple[dict[str, Any], int, Counter[str], int]:
+    """Metadata, tensor count, parameters per ggml type and file size of one file."""
+    with open(path, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as buf:
+        if buf[:4] != GGUF_MAGIC:
+            raise ValueError(f"{path} is not a GGUF file")
+
+        r = GGUFReader(buf)
+        r.pos = 4
+        version = r.unpack("<I")
+        if version < 2:
+            raise ValueError(f"{path}: GGUF version {version} is not supported")
+
+        tensor_count = r.unpack("<Q")
+        kv_count = r.unpack("<Q")
+
+        kv: dict[str, Any] = {}
+        for _ in range(kv_count):
+            key = r.string()
+            typ = r.unpack("<I")
+            # The tokenizer vocabulary is most of the header, skip it
+            kv[key] = r.value(typ, keep=not key.startswith("tokenizer."))
+
+        types: Counter[str] = Counter()
+        for _ in range(tensor_count):
+            r.skip_string()
+            n_dims = r.unpack("<I")
+            dims = struct.unpack_from(f"<{n_dims}Q", buf, r.pos)
+            r.pos += 8 * n_dims
+            ggml_type = r.unpack("<I")
+            r.pos += 8  # offset
+
+            types[GGML_TYPES.get(ggml_type, str(ggml_type))] += math.prod(dims)
+
+        return kv, tensor_count, types, buf.size()
+
+
+# model-00001-of-00003.gguf, the naming of llama.cpp gguf-split
+GGUF_SPLIT_RE = re.compile(r"-(\d{5})-of-(\d{5})\.gguf$")
+
+
+def is_later_shard(path: str) -> bool:
+    """Shards after the first of a split GGUF, read_gguf of the first reads them."""
+    match = GGUF_SPLIT_RE.search(path)
+    return match is not None and int(match.group(1)) > 1
+
+
+def split_paths(path: str, count: int) -> list[str]:
+    """All shards of a split GGUF, model-00001-of-00003.gguf -> 00001..00003"""
+    match = GGUF_SPLIT_RE.search(path)
+    if match is None:
+        raise ValueError(f"{path}: split into {count} files, but not named like one")
+
+    prefix = path[: match.start()]
+    return [f"{prefix}-{i:05d}-of-{count:05d}.gguf" for i in range(1, count + 1)]
+
+
+def read_gguf(path: str) -> ModelMeta:
+    """Metadata of a GGUF model, with every shard counted if it is split."""
+    kv, tensor_count, types, size = read_gguf_header(path)
+
+    # The architecture is only in the first shard
+    split_count = kv.get("split.count", 1)
+    if split_count > 1:
+        kv, tensor_count, types, size = {}, 0, Counter(), 0
+        for shard in split_paths(path, split_count):
+            shard_kv, shard_tensors, shard_types, shard_size = read_gguf_header(shard)
+            kv = {**shard_kv, **kv}
+            tensor_count += shard_tensors
+            types += shard_types
+            size += shard_size
+
+    params = sum(types.values())
+
+    arch = kv.get("general.architecture")
+    file_type = kv.get("general.file_type")
+    quant_type = GGUF_FILE_TYPES.get(file_type) if file_type is not None else None
+    if quant_type is None and types:
+        quant_type = types.most_common(1)[0][0]
+
+    heads = kv.get(f"{arch}.attention.head_count")
+    if isinstance(heads, list):
+        heads = max(heads)
+    kv_heads = kv.get(f"{arch}.attention.head_count_kv", heads)
+    if isinstance(kv_heads, list):
+        kv_heads = max(kv_heads)
+
+    head_dim = kv.get(f"{arch}.attention.key_length")
+    embedding = kv.get(f"{arch}.embedding_length")
+    if head_dim is None and embedding and heads:
+        head_dim = embedding // heads
+
+    return {
+        "name": os.path.basename(path),
+        "path": path,
+        "format": "gguf",
+        "architecture": arch,
+        "quant_type": quant_type,
+        "parameter_count": params,
+        "tensor_count": tensor_count,
+        "size_bytes": size,
+        "context_length": kv.get(f"{arch}.context_length"),
+        "num_layers": kv.get(f"{arch}.block_count"),
+        "num_attention_heads": heads,
+        "num_kv_heads": kv_heads,
+        "head_dim": head_dim,
+    }
+
+
+# # SAFETENSORS
+
+
+def read_safetensors_header(path: str) -> dict[str, Any]:
+    with open(path, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as buf:
+        (n,) = struct.unpack_from("<Q", buf, 0)
+        return json.loads(buf[8 : 8 + n])
+
+
+def safetensors_shards(path: str) -> list[str]:
+    """Weight files of a model folder, without e.g. a consolidated.safetensors copy."""
+    index_path = os.path.join(path, "model.safetensors.index.json")
+    if os.path.isfile(index_path):
+        with open(index_path) as f:
+            files = set(json.load(f)["weight_map"].values())
+    else:
+        files = {
+            name
+            for name in os.listdir(path)
+            if fnmatch.fnmatch(name, "model*.safetensors")
+        }
+    return [os.path.join(path, name) for name in sorted(files)]
+
+
+def read_safetensors(path: str) -> ModelMeta:
+    """Metadata of a model folder, from its safetensors headers and config.json."""
+    params = 0
+    tensor_count = 0
+    size = 0
+    dtypes: Counter[str] = Counter()
+
+    for shard in safetensors_shards(path):
+        size += os.path.getsize(shard)
+        for name, tensor in read_safetensors_header(shard).items():
+            if name == "__metadata__":
+                continue
+            n = math.prod(tensor["shape"])
+            params += n
+            tensor_count += 1
+            dtypes[tensor["dtype"]] += n
+
+    config = {}
+    config_path = os.path.join(path, "config.json")
+    if os.path.isfile(config_path):
+        with open(config_path) as f:
+            config = json.load(f)
+
+    quant_type = None
+    if "quantization_config" in config:
+        quant_type = config["quantization_config"].get("quant_method")
+    elif dtypes:
+        quant_type = dtypes.most_common(1)[0][0]
+
+    architectures = config.get("architectures") or [None]
+
+    # Multimodal models keep the LLM config nested
+    config = config.get("text_config", config)
+    heads = config.get("num_attention_heads")
+    head_dim = config.get("head_dim")
+    if head_dim is None and heads and config.get("hidden_size"):
+        head_dim = config["hidden_size"] // heads
+
+    return {
+        "name": f"{os.path.basename(os.path.dirname(path))}/{os.path.basename(path)}",
+        "path": path,
+        "format": "safetensors",
+        "architecture": architectures[0],
+        "quant_type": quant_type,
+        "parameter_count": params,
+        "tensor_count": tensor_count,
+        "size_bytes": size,
+        "context_length": config.get("max_position_embeddings"),
+        "num_layers": config.get("num_hidden_layers"),
+        "num_attention_heads": heads,
+        "num_kv_heads": config.get("num_key_value_heads", heads),
+        "head_dim": head_dim,
+    }
+
+
+# # SCAN
+
+
+def read(model: Model) -> ModelMeta:
+    if model["path"].endswith(".gguf"):
+        meta = read_gguf(model["path"])
+    else:
+        meta = read_safetensors(model["path"])
+    meta["name"] = model["name"]
+    return meta
+
+
+def scan(
+    path: str = MODEL_PATH, workers: Optional[int] = None
+) -> list[Optional[ModelMeta]]:
+    """Read the metadata of every model in `path` in parallel, None where unreadable."""
+
+    def safe_read(model: Model) -> Optional[ModelMeta]:
+        try:
+            return read(model)
+        except (OSError, ValueError, struct.error) as e:
+            # stdout may be --json
+            print(f"Could not read {model['path']}: {e}", file=sys.stderr)
+            return None
+
+    # A split GGUF is listed once per shard, it is one model
+    models = [m for m in find_models(path) if not is_later_shard(m["path"])]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(safe_read, models))
+
+
+def human(n: float, units: list[str]) -> str:
+    for unit in units[:-1]:
+        if n < 1000:
+            return f"{n:.1f}{unit}"
+        n /= 1000
+    return f"{n:.1f}{units[-1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", nargs="?", default=MODEL_PATH, help="model folder")
+    parser.add_argument("--json", action="store_true", help="print as json")
+
+    args = parser.parse_args()
+
+    metas = [m for m in scan(args.path) if m is not None]
+
+    if args.json:
+        print(json.dumps(metas, indent=2))
+    else:
+        for m in metas:
+            print(
+                f"{human(m['parameter_count'], ['', 'K', 'M', 'B', 'T']):>7}"
+                f"  {m['quant_type'] or '?':<8}"
+                f"  {human(m['size_bytes'], ['B', 'KB', 'MB', 'GB', 'TB']):>8}"
+                f"  ctx={m['context_length'] or '?':<7}"
+                f"  {m['architecture'] or '?':<24}  {m['name']}"
+            )
@@ -0,0 +1,278 @@
+import argparse
+import json
+import math
+import sys
+from typing import Optional, TypedDict
+
+import modelmeta
+from launcher import Model, build_argv, find_models, merged_options
+
+# {"base_port": 8000, "nodes": [{"host": "gpu1", "gpus": [{"index": 0, "memory_gb": 24}]}]}
+INVENTORY_FILE = "/home/ubuntu/vllm_server_scripts/inventory.json"
+
+GIB = 1024**3
+OVERHEAD_BYTES = int(1.5 * GIB)  # CUDA context, activations and graphs per GPU
+DEFAULT_MAX_MODEL_LEN = 8192
+DEFAULT_BASE_PORT = 8000
+TP_SIZES = [1, 2, 4, 8]
+
+
+# # TYPES
+
+
+class Gpu(TypedDict, total=True):
+    index: int
+    memory_gb: float
+
+
+class Node(TypedDict, total=True):
+    host: str
+    gpus: list[Gpu]
+
+
+class Inventory(TypedDict, total=False):
+    base_port: int
+    nodes: list[Node]
+
+
+class ModelSpec(TypedDict, total=True):
+    name: str
+    path: str
+    weights_bytes: int
+    num_layers: int
+    num_attention_heads: int
+    num_kv_heads: int
+    head_dim: int
+    max_model_len: int
+
+
+class Placement(TypedDict, total=True):
+    name: str
+    host: str
+    gpus: list[int]
+    port: int
+    tensor_parallel_size: int
+    gpu_memory_utilization: float
+    max_model_len: int
+
+
+class LaunchPlan(TypedDict, total=True):
+    name: str
+    host: str
+    port: int
+    env: dict[str, str]
+    argv: list[str]
+
+
+# # MODEL SIZES
+
+
+def model_spec(model: Model, max_model_len: Optional[int] = None) -> ModelSpec:
+    """Read the size and attention shape of a model from its file headers."""
+    meta = modelmeta.read(model)
+
+    # Unknown shapes fall back to a 7B-ish llama layout, which overestimates
+    # the KV cache of smaller models
+    num_heads = meta["num_attention_heads"] or 32
+
+    if max_model_len is None:
+        max_model_len = min(
+            meta["context_length"] or DEFAULT_MAX_MODEL_LEN, DEFAULT_MAX_MODEL_LEN
+        )
+
+    return {
+        "name": model["name"],
+        "path": model["path"],
+        "weights_bytes": meta["size_bytes"],
+        "num_layers": meta["num_layers"] or 32,
+        "num_attention_heads": num_heads,
+        "num_kv_heads": meta["num_kv_heads"] or num_heads,
+        "head_dim": meta["head_dim"] or 4096 // num_heads,
+        "max_model_len": max_model_len,
+    }
+
+
+def kv_cache_bytes(spec: ModelSpec, dtype_bytes: int = 2) -> int:
+    """KV cache of one sequence of max_model_len tokens."""
+    return (
+        2
+        * spec["num_layers"]
+        * spec["num_kv_heads"]
+        * spec["head_dim"]
+        * spec["max_model_len"]
+        * dtype_bytes
+    )
+
+
+def per_gpu_bytes(spec: ModelSpec, tp: int) -> int:
+    return (spec["weights_bytes"] + kv_cache_bytes(spec)) // tp + OVERHEAD_BYTES
+
+
+# # PLANNER
+
+
+def plan(specs: list[ModelSpec], inventory: Inventory) -> list[Placement]:
+    """Place every model on the smallest tensor-parallel group of GPUs it fits on.
+
+    Models are placed largest first, each on same-size GPUs of a single node with
+    the most free memory. Raises ValueError if a model fits nowhere.
+    """
+    free: dict[tuple[str, int], int] = {}
+    total: dict[tuple[str, int], int] = {}
+    for node in inventory["nodes"]:
+        for gpu in node["gpus"]:
+            key = (node["host"], gpu["index"])
+            total[key] = free[key] = int(gpu["memory_gb"] * GIB)
+
+    base_port = inventory.get("base_port", DEFAULT_BASE_PORT)
+    ports: dict[str, int] = {}
+
+    placements: list[Placement] = []
+    for spec in sorted(specs, key=lambda s: s["weights_bytes"], reverse=True):
+        placement: Optional[Placement] = None
+
+        for tp in TP_SIZES:
+            if spec["num_attention_heads"] % tp:
+                continue
+            need = per_gpu_bytes(spec, tp)
+
+            for node in inventory["nodes"]:
+                host = node["host"]
+
+                # gpu-memory-utilization is a fraction of each GPU, so a group
+                # only holds GPUs of one size
+                sizes = sorted({total[(host, g["index"])] for g in node["gpus"]})
+                for size in sizes:
+                    gpus = sorted(
+                        (
+                            g["index"]
+                            for g in node["gpus"]
+                            if total[(host, g["index"])] == size
+                        ),
+                        key=lambda i: free[(host, i)],
+                        reverse=True,
+                    )[:tp]
+
+                    # What vllm will actually take, after rounding up
+                    utilization = math.ceil(need / size * 100) / 100
+                    reserved = math.ceil(utilization * size)
+                    if len(gpus) < tp or free[(host, gpus[-1])] < reserved:
+                        continue
+
+                    for i in gpus:
+                        free[(host, i)] -= reserved
+
+                    port = ports.get(host, base_port)
+                    ports[host] = port + 1
+
+                    placement = {
+                        "name": spec["name"],
+                        "host": host,
+                        "gpus": sorted(gpus),
+                        "port": port,
+                        "tensor_parallel_size": tp,
+                        "gpu_memory_utilization": utilization,
+                        "max_model_len": spec["max_model_len"],
+                    }
+                    break
+
+                if placement is not None:
+                    break
+
+            if placement is not None:
+                break
+
+        if placement is None:
+            size = spec["weights_bytes"] / GIB
+            raise ValueError(f"{spec['name']} ({size:.1f} GiB) does not fit on any node")
+        placements.append(placement)
+
+    return placements
+
+
+def launch_plan(placement: Placement, model: Model) -> LaunchPlan:
+    """Command of a placement: model config + common.conf, with the placement on top."""
+    options = merged_options(model["name"])
+    for name, value in (
+        ("tensor-parallel-size", placement["tensor_parallel_size"]),
+        ("gpu-memory-utilization", placement["gpu_memory_utilization"]),
+        ("max-model-len", placement["max_model_len"]),
+        ("port", placement["port"]),
+    ):
+        options[name] = {
+            "name": name,
+            "values": [str(value)],
+            "args": [[str(value)]],
+            "source": "planner",
+            "valid": True,
+        }
+
+    return {
+        "name": placement["name"],
+        "host": placement["host"],
+        "port": placement["port"],
+        "env": {
+            "CUDA_VISIBLE_DEVICES": ",".join(str(i) for i in placement["gpus"]),
+            "MODEL": model["path"],
+        },
+        "argv": build_argv(model["path"], options),
+    }
+
+
+def load_inventory(path: str = INVENTORY_FILE) -> Inventory:
+    with open(path) as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "models", nargs="+", help="model names as listed by vllm_script.sh"
+    )
+    parser.add_argument(
+        "--inventory", default=INVENTORY_FILE, help="GPU inventory json"
+    )
+    parser.add_argument(
+        "--max-model-len", type=int, help="context length to reserve KV cache for"
+    )
+    parser.add_argument("-o", "--output", help="write the launch plans to this file")
+
+    args = parser.parse_args()
+
+    by_name = {m["name"]: m for m in find_models()}
+    missing = [name for name in args.models if name not in by_name]
+    if missing:
+        sys.exit(f"Unknown models: {', '.join(missing)}")
+
+    specs = []
+    for name in args.models:
+        max_model_len = args.max_model_len
+        if max_model_len is None:
+            configured = merged_options(name).get("max-model-len")
+            value = configured["values"][-1] if configured is not None else None
+            if value is not None:
+                try:
+                    max_model_len = int(value)
+                except ValueError:
+                    sys.exit(
+                        f"{name}: max-model-len {value} in {configured['source']} "
+                        "is not a number, pass --max-model-len"
+                    )
+        specs.append(model_spec(by_name[name], max_model_len))
+
+    try:
+        placements = plan(specs, load_inventory(args.inventory))
+    except ValueError as e:
+        sys.exit(f"Can not place the models: {e}")
+    plans = [launch_plan(p, by_name[p["name"]]) for p in placements]
+
+    for p in placements:
+        print(
+            f"{p['host']}:{p['port']}  GPUs {p['gpus']}  TP={p['tensor_parallel_size']}"
+            f"  util={p['gpu_memory_utilization']}  {p['name']}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(plans, f, indent=2)
+        print(f"Wrote launch plans to {args.output}")
@@ -0,0 +1,467 @@
+import argparse
+import datetime
+import json
+import os
+import re
+import shlex
+import subprocess
+import sys
+import time
+from typing import Optional, TypedDict
+
+from launcher import (
+    MODEL_PATH,
+    config_of,
+    find_models,
+    load_valid_args,
+    merged_options,
+    options_argv,
+    to_argv,
+)
+
+BENCH_FILE = "/home/ubuntu/preset_bench.json"
+BENCH_LOG_DIR = "/home/ubuntu/preset_bench_logs"
+
+BENCH_PORT = 8123
+BENCH_MAX_TOKENS = 256
+BENCH_PROMPTS = [
+    "Write a Python function that returns the n-th Fibonacci number iteratively.",
+    "Explain the difference between a process and a thread in a few paragraphs.",
+    "Summarize the plot of Romeo and Juliet.",
+    "List ten common HTTP status codes and what they mean.",
+    "Translate to French: The quick brown fox jumps over the lazy dog.",
+]
+
+# A single run of the bench prompts varies by a few percent, 'auto' only
+# applies a preset that is clearly faster
+AUTO_MIN_SPEEDUP = 1.05
+
+
+# # TYPES
+
+
+class Preset(TypedDict, total=True):
+    name: str
+    draft_repo: Optional[str]  # HF repo of the draft model, "[ngram]" for ngram lookup
+    num_speculative_tokens: int
+    quantization: Optional[str]
+    kv_cache_dtype: Optional[str]
+
+
+class BenchResult(TypedDict, total=True):
+    baseline_tps: float
+    preset_tps: float
+    speedup: float  # 0.0 if the run failed
+    flags: list[str]
+    date: str
+    error: Optional[str]
+
+
+def preset(
+    name: str,
+    draft_repo: Optional[str] = None,
+    num_speculative_tokens: int = 0,
+    quantization: Optional[str] = None,
+    kv_cache_dtype: Optional[str] = None,
+) -> Preset:
+    return {
+        "name": name,
+        "draft_repo": draft_repo,
+        "num_speculative_tokens": num_speculative_tokens,
+        "quantization": quantization,
+        "kv_cache_dtype": kv_cache_dtype,
+    }
+
+
+# # PRESETS
+
+# Model families, matched against the (lowercased) model repo / file name in order
+FAMILIES: list[tuple[str, str]] = [
+    ("deepseek-r1-distill-qwen", r"deepseek-r1-distill-qwen"),
+    ("deepseek-r1-distill-llama", r"deepseek-r1-distill-llama"),
+    ("qwen2.5-coder", r"qwen2\.5-coder"),
+    ("qwen2.5", r"qwen2\.5"),
+    ("llama3", r"llama-3"),
+    ("gemma2", r"gemma-2"),
+]
+
+FAMILY_DRAFTS: dict[str, str] = {
+    "deepseek-r1-distill-qwen": "deepseek-ai/DeepSeek-R1-Distill-Qwen-1.5B",
+    "deepseek-r1-distill-llama": "meta-llama/Llama-3.2-1B-Instruct",
+    "qwen2.5-coder": "Qwen/Qwen2.5-Coder-0.5B-Instruct",
+    "qwen2.5": "Qwen/Qwen2.5-0.5B-Instruct",
+    "llama3": "meta-llama/Llama-3.2-1B-Instruct",
+    "gemma2": "google/gemma-2-2b-it",
+}
+
+# Family-agnostic presets
+COMMON_PRESETS: list[Preset] = [
+    preset("ngram", draft_repo="[ngram]", num_speculative_tokens=4),
+    preset("fp8", quantization="fp8", kv_cache_dtype="fp8"),
+    preset("kv-fp8", kv_cache_dtype="fp8"),
+]
+
+
+def family_of(model: str) -> Optional[str]:
+    model = model.lower()
+    for family, pattern in FAMILIES:
+        if re.search(pattern, model):
+            return family
+    return None
+
+
+def size_of(model: str) -> Optional[float]:
+    """Parameter count in billions from the name, e.g. Qwen2.5-0.5B-Instruct -> 0.5"""
+    match = re.search(r"(?<![\d.])(\d+(?:\.\d+)?)b(?![a-z])", model.lower())
+    return float(match.group(1)) if match else None
+
+
+def is_quantized(model_path: str) -> bool:
+    """GGUF files and AWQ/GPTQ/... checkpoints can not be quantized again."""
+    if model_path.endswith(".gguf"):
+        return True
+
+    config_path = os.path.join(model_path, "config.json")
+    if not os.path.isfile(config_path):
+        return False
+    with open(config_path) as f:
+        return "quantization_config" in json.load(f)
+
+
+def presets_of(model: str, model_path: Optional[str] = None) -> list[Preset]:
+    """Presets that make sense for `model`, `model_path` defaults to its local path."""
+    if model_path is None:
+        model_path = model_path_of(model)
+
+    presets = []
+
+    family = family_of(model)
+    if family is not None:
+        draft = FAMILY_DRAFTS[family]
+        size, draft_size = size_of(model), size_of(draft)
+
+        # No point in drafting with a model as big as the target
+        if (
+            os.path.basename(draft).lower() not in model.lower()
+            and (size is None or draft_size is None or size > draft_size)
+        ):
+            presets += [
+                preset("draft", draft_repo=draft, num_speculative_tokens=5),
+                preset(
+                    "draft-fp8",
+                    draft_repo=draft,
+                    num_speculative_tokens=5,
+                    quantization="fp8",
+                    kv_cache_dtype="fp8",
+                ),
+            ]
+
+    presets += COMMON_PRESETS
+
+    if is_quantized(model_path):
+        presets = [p for p in presets if p["quantization"] is None]
+    return presets
+
+
+def resolve(
+    model: str, name: str, model_path: Optional[str] = None
+) -> Optional[Preset]:
+    """Get preset `name` of `model`.
+
+    'auto' picks the preset with the best measured speedup, or None if no
+    preset was measured at least AUTO_MIN_SPEEDUP times faster than the baseline.
+    """
+    presets = presets_of(model, model_path)
+
+    if name == "auto":
+        results = load_results().get(model, {})
+        faster = [
+            p
+            for p in presets
+            if results.get(p["name"], {}).get("speedup", 0) >= AUTO_MIN_SPEEDUP
+        ]
+        if faster:
+            return max(faster, key=lambda p: results[p["name"]]["speedup"])
+        return None
+
+    for p in presets:
+        if p["name"] == name:
+            return p
+
+    names = ", ".join(p["name"] for p in presets)
+    raise ValueError(f"Unknown preset {name} for {model}, choose from: {names}")
+
+
+# # FLAGS
+
+# Every option a preset may set
+PRESET_KEYS = (
+    "speculative-config",  # set by hand, conflicts with speculative-model
+    "speculative-model",
+    "num-speculative-tokens",
+    "ngram-prompt-lookup-max",
+    "quantization",
+    "kv-cache-dtype",
+)
+
+
+def preset_opts(p: Preset, model_path: str = MODEL_PATH) -> dict[str, list[str]]:
+    """Config file options of the preset, as {name: args}."""
+    opts: dict[str, list[str]] = {}
+
+    if p["draft_repo"] == "[ngram]":
+        opts["speculative-model"] = ["[ngram]"]
+        opts["ngram-prompt-lookup-max"] = [str(p["num_speculative_tokens"])]
+    elif p["draft_repo"]:
+        opts["speculative-model"] = [os.path.join(model_path, p["draft_repo"])]
+
+    if p["draft_repo"]:
+        opts["num-speculative-tokens"] = [str(p["num_speculative_tokens"])]
+
+    if p["quantization"]:
+        opts["quantization"] = [p["quantization"]]
+
+    if p["kv_cache_dtype"]:
+        opts["kv-cache-dtype"] = [p["kv_cache_dtype"]]
+
+    return opts
+
+
+def validate_opts(opts: dict[str, list[str]], valid_args: frozenset[str]):
+    unknown = [name for name in opts if name not in valid_args]
+    if unknown:
+        raise ValueError(f"Unknown vllm arguments: {', '.join(unknown)}")
+
+
+def check_draft(p: Preset, opts: dict[str, list[str]]):
+    """vllm fails to start if the draft model of the preset is not downloaded."""
+    draft_path = opts.get("speculative-model", ["[ngram]"])[0]
+    if draft_path != "[ngram]" and not os.path.isdir(draft_path):
+        raise FileNotFoundError(
+            f"Draft model {p['draft_repo']} is not downloaded, "
+            f"run: python dl.py {p['draft_repo']}"
+        )
+
+
+# # CONFIG FILES
+
+
+def apply(model: str, p: Preset, model_path: str = MODEL_PATH):
+    """Write the preset flags into the model config, replacing older preset flags.
+
+    Every other line of the config, comments included, is kept as is.
+    """
+    opts = preset_opts(p, model_path)
+    validate_opts(opts, load_valid_args())
+    check_draft(p, opts)
+
+    path = config_of(model)
+    lines = []
+    if os.path.exists(path):
+        with open(path) as f:
+            lines = f.read().splitlines()
+
+    # Drop flags any other preset may have set
+    kept = [
+        line
+        for line in lines
+        if not line.strip()
+        or line.split(None, 1)[0].removeprefix("--") not in PRESET_KEYS
+    ]
+    for name, args in opts.items():
+        kept.append(" ".join([name, *map(shlex.quote, args)]))
+
+    with open(path, "w") as f:
+        f.write("\n".join(kept) + "\n")
+    return path
+
+
+# # BENCHMARK
+
+
+def model_path_of(model: str) -> str:
+    for m in find_models():
+        if m["name"] == model:
+            return m["path"]
+
+    raise FileNotFoundError(f"{model} not found in {MODEL_PATH}")
+
+
+def load_results(path: str = BENCH_FILE) -> dict[str, dict[str, BenchResult]]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_result(model: str, name: str, result: BenchResult, path: str = BENCH_FILE):
+    results = load_results(path)
+    results.setdefault(model, {})[name] = result
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def bench_log(model: str, name: str) -> str:
+    """Log file of one vllm run of `bench`, kept to see why a preset failed."""
+    os.makedirs(BENCH_LOG_DIR, exist_ok=True)
+    file_name = f"{os.path.basename(config_of(model))}.{name}.log"
+    return os.path.join(BENCH_LOG_DIR, file_name)
+
+
+def measure(
+    model_path: str, argv: list[str], log_path: str, timeout: float = 900
+) -> float:
+    """Start `vllm serve` with argv, run the bench prompts and return completion tokens/s."""
+    from backends import Local
+
+    with open(log_path, "w") as log:
+        proc = subprocess.Popen(
+            ["vllm", "serve", model_path, *argv, "--port", str(BENCH_PORT)],
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+    try:
+        client = Local(f"http://localhost:{BENCH_PORT}/v1")
+
+        deadline = time.monotonic() + timeout
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"vllm exited with code {proc.returncode}")
+            try:
+                served = client.models()["data"][0]["id"]
+                break
+            except Exception:
+                if time.monotonic() > deadline:
+                    raise TimeoutError("vllm did not start in time")
+                time.sleep(2)
+
+        # Warmup
+        client.chat_completion(
+            model=served,
+            messages=[{"role": "user", "content": "Hi"}],
+            max_tokens=8,
+        )
+
+        tokens = 0
+        elapsed = 0.0
+        for prompt in BENCH_PROMPTS:
+            start = time.perf_counter()
+            resp = client.chat_completion(
+                model=served,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=BENCH_MAX_TOKENS,
+                temperature=0,
+                seed=0,
+            )
+            elapsed += time.perf_counter() - start
+            tokens += resp["usage"]["completion_tokens"]
+
+        return tokens / elapsed
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+def bench(model: str, p: Preset) -> BenchResult:
+    """A/B the model config (with its preset flags removed) against config + preset."""
+    valid_args = load_valid_args()
+    opts = preset_opts(p)
+    validate_opts(opts, valid_args)
+    check_draft(p, opts)
+
+    baseline = merged_options(model)
+    for key in (*PRESET_KEYS, "port"):
+        baseline.pop(key, None)
+
+    model_path = model_path_of(model)
+
+    result: BenchResult = {
+        "baseline_tps": 0.0,
+        "preset_tps": 0.0,
+        "speedup": 0.0,
+        "flags": to_argv(opts),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "error": None,
+    }
+    log_path = bench_log(model, "baseline")
+    try:
+        print(f"Measuring baseline of {model}...")
+        result["baseline_tps"] = measure(model_path, options_argv(baseline), log_path)
+        print(f"  {result['baseline_tps']:.1f} tok/s")
+
+        log_path = bench_log(model, p["name"])
+        print(f"Measuring preset {p['name']}...")
+        result["preset_tps"] = measure(
+            model_path, options_argv(baseline) + to_argv(opts), log_path
+        )
+        print(f"  {result['preset_tps']:.1f} tok/s")
+
+        result["speedup"] = result["preset_tps"] / result["baseline_tps"]
+    except Exception as e:
+        # Recorded as failed, so 'auto' never picks it
+        result["error"] = f"{type(e).__name__}: {e}, vllm log: {log_path}"
+
+    save_result(model, p["name"], result)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="cmd", required=True)
+
+    p_list = subparsers.add_parser("list", help="list presets of a model")
+    p_list.add_argument("model", help="model name as listed by vllm_script.sh")
+
+    p_apply = subparsers.add_parser("apply", help="write preset flags to the model config")
+    p_apply.add_argument("model", help="model name as listed by vllm_script.sh")
+    p_apply.add_argument("preset", help="preset name, or 'auto'")
+
+    p_bench = subparsers.add_parser("bench", help="measure the speedup of a preset")
+    p_bench.add_argument("model", help="model name as listed by vllm_script.sh")
+    p_bench.add_argument("preset", nargs="*", help="preset names, all if not given")
+
+    args = parser.parse_args()
+
+    if args.cmd == "list":
+        results = load_results().get(args.model, {})
+        print(f"Family: {family_of(args.model) or '(unknown)'}")
+        for p in presets_of(args.model):
+            measured = results.get(p["name"])
+            if measured is None:
+                speedup = "(not measured)"
+            elif measured.get("error"):
+                speedup = "(failed)"
+            else:
+                speedup = f"x{measured['speedup']:.2f}"
+            print(f"  {p['name']:<12} {speedup:<16} {' '.join(to_argv(preset_opts(p)))}")
+
+    elif args.cmd == "apply":
+        p = resolve(args.model, args.preset)
+        if p is None:
+            print("No preset was measured faster than the baseline, config left as is")
+        else:
+            try:
+                path = apply(args.model, p)
+            except FileNotFoundError as e:
+                sys.exit(str(e))
+            print(f"Applied preset {p['name']} to {path}")
+
+    elif args.cmd == "bench":
+        names = args.preset or [p["name"] for p in presets_of(args.model)]
+        for name in names:
+            p = resolve(args.model, name)
+            if p is None:
+                continue
+            try:
+                result = bench(args.model, p)
+            except FileNotFoundError as e:
+                print(f"{p['name']}: skipped, {e}")
+                continue
+            if result["error"]:
+                print(f"{p['name']}: failed, {result['error']}")
+            else:
+                print(f"{p['name']}: x{result['speedup']:.2f}")
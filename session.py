@@ -0,0 +1,83 @@
+import json
+from typing import Any, Literal, Optional, Unpack
+
+import requests
+
+from typs import Messages, Params
+
+
+def encode(obj: Any) -> bytes:
+    # ASCII escapes like json.dumps in backends.py, lone surrogates can not be utf-8
+    return json.dumps(obj, separators=(",", ":")).encode("ascii")
+
+
+class ChatSession:
+    """Multi-turn chat against a backend (`Local(...)`, `OpenRouter`, ...).
+
+    Every message is serialized once, when it is added, and kept in a running
+    `{"model":...,"messages":[...` prefix. A turn only encodes its new messages
+    and the request params, instead of `json.dumps` of the whole transcript.
+    Messages are copied when added and never rewritten, so the prompt prefix
+    stays byte-identical between turns and the server prefix cache keeps hitting.
+    """
+
+    def __init__(self, backend, model: str, **params: Unpack[Params]) -> None:
+        self.backend = backend
+        self.model = model
+        self.params = params
+
+        self.messages: list[Messages.TextOnlyMessage.t] = []
+        self._prefix = bytearray(b'{"model":' + encode(model) + b',"messages":[')
+        self._ends: list[int] = []  # prefix length before each message
+
+    def add(self, role: Literal["user", "system", "assistant"], content: str):
+        self._ends.append(len(self._prefix))
+        if self.messages:
+            self._prefix += b","
+        self._prefix += encode({"role": role, "content": content})
+        self.messages.append({"role": role, "content": content})
+
+    def pop(self) -> Messages.TextOnlyMessage.t:
+        del self._prefix[self._ends.pop() :]
+        return self.messages.pop()
+
+    def body(self, **params: Unpack[Params]) -> bytes:
+        """Request body for the current transcript, `params` override the session ones."""
+        tail = encode({**self.params, **params})
+        if len(tail) > 2:
+            # '{"temperature":0.7}' -> '],"temperature":0.7}'
+            tail = b"]," + tail[1:]
+        else:
+            tail = b"]}"
+        # Single copy of the transcript
+        return b"".join((self._prefix, tail))
+
+    def send(self, **params: Unpack[Params]):
+        return requests.post(
+            self.backend.ENDPOINTS["chat_completion"],
+            headers=self.backend.HEADER,
+            data=self.body(**params),
+        ).json()
+
+    def chat(self, content: str, **params: Unpack[Params]) -> Optional[str]:
+        """Send a user message, keep the assistant reply in the transcript and return it.
+
+        A reply without text (tool call, refusal) returns None and leaves the
+        transcript as it was before the turn.
+        """
+        self.add("user", content)
+        try:
+            resp = self.send(**params)
+            reply = resp["choices"][0]["message"].get("content")
+        except Exception:
+            # Keep the transcript as it was, so the turn can be retried
+            self.pop()
+            raise
+
+        if reply is None:
+            # Tool call or refusal, a user message without an answer would be
+            # followed by a second user message next turn
+            self.pop()
+        else:
+            self.add("assistant", reply)
+        return reply
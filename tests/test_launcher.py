@@ -0,0 +1,124 @@
+import os
+
+import pytest
+
+import launcher
+
+VALID_ARGS = frozenset(["max-model-len", "lora-modules", "middleware", "port"])
+
+
+@pytest.mark.parametrize(
+    "value, args",
+    [
+        ("8192", ["8192"]),
+        ("a=/x b=/y", ["a=/x", "b=/y"]),
+        ("""'{"k": 1}'""", ['{"k": 1}']),
+        ("", []),
+        # Unbalanced quote
+        ("it's 1", ["it's", "1"]),
+    ],
+)
+def test_split_value(value, args):
+    assert launcher.split_value(value) == args
+
+
+def test_parse_config(tmp_path):
+    config = tmp_path / "config"
+    config.write_text(
+        "# comment\n"
+        "\n"
+        "--max-model-len\t8192\n"
+        "lora-modules a=/x b=/y\n"
+        "enable-foo\n"
+        "middleware a.b\n"
+        "  middleware   c.d  \n"
+    )
+
+    options = launcher.parse_config(str(config), VALID_ARGS)
+    assert list(options) == [
+        "max-model-len",
+        "lora-modules",
+        "enable-foo",
+        "middleware",
+    ]
+
+    assert options["max-model-len"]["values"] == ["8192"]
+    assert options["lora-modules"]["args"] == [["a=/x", "b=/y"]]
+    assert options["enable-foo"]["values"] == [None]
+    assert options["enable-foo"]["args"] == [[]]
+    assert not options["enable-foo"]["valid"]
+    assert options["middleware"]["values"] == ["a.b", "c.d"]
+    assert options["middleware"]["source"] == str(config)
+
+    assert launcher.parse_config(str(tmp_path / "missing"), VALID_ARGS) == {}
+
+
+def test_merged_options(tmp_path, monkeypatch):
+    common = tmp_path / "common.conf"
+    common.write_text("max-model-len 4096\nport 8000\nmiddleware a.b\nmiddleware c.d\n")
+    monkeypatch.setattr(launcher, "COMMON_CONFIG_PATH", str(common))
+    monkeypatch.setattr(launcher, "CONFIG_PATH", str(tmp_path))
+    monkeypatch.setattr(launcher, "load_valid_args", lambda: VALID_ARGS)
+
+    (tmp_path / "org_Model-7B").write_text("max-model-len 8192\nmiddleware e.f\n")
+
+    options = launcher.merged_options("org/Model-7B")
+    assert options["max-model-len"]["values"] == ["8192"]
+    assert options["max-model-len"]["source"] == str(tmp_path / "org_Model-7B")
+    assert options["port"]["values"] == ["8000"]
+    # The model config replaces every common.conf line of the option
+    assert options["middleware"]["values"] == ["e.f"]
+
+
+def test_build_argv(tmp_path, capsys):
+    config = tmp_path / "config"
+    config.write_text(
+        "lora-modules a=/x 'b=/y z'\nenable-foo\nmiddleware a.b\nmiddleware c.d\n"
+    )
+    options = launcher.parse_config(str(config), VALID_ARGS)
+
+    assert launcher.build_argv("/models/m", options) == [
+        "vllm",
+        "serve",
+        "/models/m",
+        "--lora-modules",
+        "a=/x",
+        "b=/y z",
+        "--enable-foo",
+        "--middleware",
+        "a.b",
+        "--middleware",
+        "c.d",
+    ]
+    # Unknown arguments warn, VLLM_VALID_ARGS.txt may be older than vllm
+    assert "enable-foo" in capsys.readouterr().err
+
+
+def test_find_models(tmp_path):
+    models = tmp_path / "models"
+    st = models / "org" / "Model-7B"
+    st.mkdir(parents=True)
+    (st / "model-00001-of-00002.safetensors").touch()
+    (st / "model-00002-of-00002.safetensors").touch()
+    (st / "sub").mkdir()
+    (st / "sub" / "ignored.gguf").touch()
+
+    gguf = models / "bartowski" / "Model-GGUF"
+    gguf.mkdir(parents=True)
+    (gguf / "Model-Q4_K_M.gguf").touch()
+    (gguf / "README.md").touch()
+
+    # Symlinked folders and files resolve to their target
+    elsewhere = tmp_path / "elsewhere" / "Real-1B"
+    elsewhere.mkdir(parents=True)
+    (elsewhere / "model.safetensors").touch()
+    os.symlink(elsewhere, models / "org" / "Alias-1B")
+    os.symlink(gguf / "Model-Q4_K_M.gguf", models / "linked.gguf")
+
+    real = os.path.realpath
+    assert launcher.find_models(str(models)) == [
+        {"name": "Model-Q4_K_M.gguf", "path": real(gguf / "Model-Q4_K_M.gguf")},
+        {"name": "linked.gguf", "path": real(gguf / "Model-Q4_K_M.gguf")},
+        {"name": "elsewhere/Real-1B", "path": real(elsewhere)},
+        {"name": "org/Model-7B", "path": real(st)},
+    ]
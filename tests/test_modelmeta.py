@@ -0,0 +1,170 @@
+import json
+import struct
+
+import pytest
+
+import modelmeta
+
+
+def s(text: str) -> bytes:
+    data = text.encode()
+    return struct.pack("<Q", len(data)) + data
+
+
+def write_gguf(path, kv: list[bytes], tensors: list[tuple[str, list[int], int]]):
+    data = b"GGUF" + struct.pack("<IQQ", 3, len(tensors), len(kv))
+    data += b"".join(kv)
+    for name, dims, ggml_type in tensors:
+        data += s(name) + struct.pack("<I", len(dims))
+        data += struct.pack(f"<{len(dims)}Q", *dims)
+        data += struct.pack("<IQ", ggml_type, 0)
+    path.write_bytes(data)
+
+
+def kv_str(key: str, value: str) -> bytes:
+    return s(key) + struct.pack("<I", 8) + s(value)
+
+
+def kv_u32(key: str, value: int) -> bytes:
+    return s(key) + struct.pack("<II", 4, value)
+
+
+def kv_u16(key: str, value: int) -> bytes:
+    return s(key) + struct.pack("<IH", 2, value)
+
+
+def kv_tokens(key: str, tokens: list[str]) -> bytes:
+    return s(key) + struct.pack("<IIQ", 9, 8, len(tokens)) + b"".join(map(s, tokens))
+
+
+LLAMA_KV = [
+    kv_str("general.architecture", "llama"),
+    kv_u32("general.file_type", 15),
+    kv_u32("llama.context_length", 4096),
+    kv_u32("llama.block_count", 2),
+    kv_u32("llama.embedding_length", 64),
+    kv_u32("llama.attention.head_count", 8),
+    kv_u32("llama.attention.head_count_kv", 2),
+    kv_tokens("tokenizer.ggml.tokens", ["a", "bb", "ccc"]),
+]
+
+
+def test_gguf(tmp_path):
+    path = tmp_path / "tiny-Q4_K_M.gguf"
+    write_gguf(path, LLAMA_KV, [("tok_embd", [64, 100], 12), ("norm", [64], 0)])
+
+    meta = modelmeta.read_gguf(str(path))
+    assert meta["architecture"] == "llama"
+    assert meta["quant_type"] == "Q4_K_M"
+    assert meta["parameter_count"] == 64 * 100 + 64
+    assert meta["tensor_count"] == 2
+    assert meta["size_bytes"] == path.stat().st_size
+    assert meta["context_length"] == 4096
+    assert meta["num_kv_heads"] == 2
+    assert meta["head_dim"] == 8
+
+
+def test_split_gguf(tmp_path):
+    first = tmp_path / "tiny-00001-of-00002.gguf"
+    second = tmp_path / "tiny-00002-of-00002.gguf"
+    write_gguf(
+        first,
+        [*LLAMA_KV, kv_u16("split.no", 0), kv_u16("split.count", 2)],
+        [("tok_embd", [64, 100], 12)],
+    )
+    write_gguf(
+        second,
+        [kv_u16("split.no", 1), kv_u16("split.count", 2)],
+        [("output", [64, 100], 12), ("norm", [64], 0)],
+    )
+
+    meta = modelmeta.read_gguf(str(first))
+    assert meta["architecture"] == "llama"
+    assert meta["parameter_count"] == 2 * 64 * 100 + 64
+    assert meta["tensor_count"] == 3
+    assert meta["size_bytes"] == first.stat().st_size + second.stat().st_size
+
+    second.unlink()
+    with pytest.raises(OSError):
+        modelmeta.read_gguf(str(first))
+
+
+def test_scan_split_gguf_once(tmp_path, capsys):
+    for no in range(2):
+        write_gguf(
+            tmp_path / f"tiny-0000{no + 1}-of-00002.gguf",
+            [*LLAMA_KV, kv_u16("split.no", no), kv_u16("split.count", 2)],
+            [(f"blk.{no}", [64, 100], 12)],
+        )
+    (tmp_path / "bad.gguf").touch()
+
+    metas = modelmeta.scan(str(tmp_path))
+    assert metas[0] is None
+    assert [(m["name"], m["parameter_count"]) for m in metas[1:]] == [
+        ("tiny-00001-of-00002.gguf", 2 * 64 * 100)
+    ]
+
+    # Errors stay out of `--json` output
+    out, err = capsys.readouterr()
+    assert out == ""
+    assert "bad.gguf" in err
+
+
+def test_truncated_gguf(tmp_path):
+    path = tmp_path / "tiny.gguf"
+    write_gguf(path, LLAMA_KV, [("tok_embd", [64, 100], 12)])
+    path.write_bytes(path.read_bytes()[:100])
+
+    with pytest.raises(struct.error):
+        modelmeta.read_gguf(str(path))
+
+
+def write_safetensors(path, tensors: dict[str, list[int]]):
+    header = json.dumps(
+        {
+            name: {"dtype": "BF16", "shape": shape, "data_offsets": [0, 0]}
+            for name, shape in tensors.items()
+        }
+    ).encode()
+    path.write_bytes(struct.pack("<Q", len(header)) + header)
+
+
+@pytest.mark.parametrize("index", [True, False])
+def test_safetensors_skips_consolidated(tmp_path, index):
+    folder = tmp_path / "org" / "tiny"
+    folder.mkdir(parents=True)
+    (folder / "config.json").write_text(
+        json.dumps(
+            {
+                "architectures": ["MistralForCausalLM"],
+                "num_attention_heads": 8,
+                "hidden_size": 64,
+                "num_hidden_layers": 2,
+            }
+        )
+    )
+    write_safetensors(folder / "model-00001-of-00002.safetensors", {"a": [64, 100]})
+    write_safetensors(folder / "model-00002-of-00002.safetensors", {"b": [64]})
+    # Same weights again in the original Mistral layout
+    write_safetensors(folder / "consolidated.safetensors", {"a": [64, 100], "b": [64]})
+    if index:
+        (folder / "model.safetensors.index.json").write_text(
+            json.dumps(
+                {
+                    "weight_map": {
+                        "a": "model-00001-of-00002.safetensors",
+                        "b": "model-00002-of-00002.safetensors",
+                    }
+                }
+            )
+        )
+
+    meta = modelmeta.read_safetensors(str(folder))
+    assert meta["name"] == "org/tiny"
+    assert meta["parameter_count"] == 64 * 100 + 64
+    assert meta["tensor_count"] == 2
+    assert meta["size_bytes"] == sum(
+        (folder / f"model-0000{i}-of-00002.safetensors").stat().st_size
+        for i in (1, 2)
+    )
+    assert meta["head_dim"] == 8
@@ -0,0 +1,155 @@
+import pytest
+
+import planner
+from planner import GIB, Inventory, ModelSpec
+
+
+def spec(name: str, weights_gb: float, heads: int = 32) -> ModelSpec:
+    # 32 layers x 8 KV heads x 128 x 8192 tokens x 2 bytes x K+V = 1 GiB of KV cache
+    return {
+        "name": name,
+        "path": f"/models/{name}",
+        "weights_bytes": int(weights_gb * GIB),
+        "num_layers": 32,
+        "num_attention_heads": heads,
+        "num_kv_heads": 8,
+        "head_dim": 128,
+        "max_model_len": 8192,
+    }
+
+
+def node(host: str, *memory_gb: float) -> dict:
+    return {
+        "host": host,
+        "gpus": [{"index": i, "memory_gb": m} for i, m in enumerate(memory_gb)],
+    }
+
+
+def test_smallest_tp():
+    inventory: Inventory = {"nodes": [node("a", 24, 24, 24, 24)]}
+
+    (small,) = planner.plan([spec("small", 10)], inventory)
+    assert small["tensor_parallel_size"] == 1
+
+    (big,) = planner.plan([spec("big", 30)], inventory)
+    assert big["tensor_parallel_size"] == 2
+    assert len(big["gpus"]) == 2
+
+
+def test_skips_tp_not_dividing_heads():
+    inventory: Inventory = {"nodes": [node("a", 24, 24, 24, 24)]}
+
+    (p,) = planner.plan([spec("m", 50, heads=32)], inventory)
+    assert p["tensor_parallel_size"] == 4
+
+    # TP 2 is too small and 6 heads can not be split 4 ways
+    with pytest.raises(ValueError):
+        planner.plan([spec("m", 50, heads=6)], inventory)
+
+
+def test_largest_first():
+    inventory: Inventory = {"nodes": [node("b", 48), node("a", 24)]}
+
+    # In the given order, small would take part of the 48 GB GPU and big would
+    # fit nowhere
+    placements = planner.plan([spec("small", 4), spec("big", 40)], inventory)
+    assert [(p["name"], p["host"]) for p in placements] == [
+        ("big", "b"),
+        ("small", "a"),
+    ]
+
+
+def test_does_not_fit():
+    inventory: Inventory = {"nodes": [node("a", 24, 24)]}
+
+    with pytest.raises(ValueError, match="huge"):
+        planner.plan([spec("huge", 200)], inventory)
+
+    # Fits alone, but not after the first one took the memory
+    with pytest.raises(ValueError, match="second"):
+        planner.plan([spec("first", 38), spec("second", 37)], inventory)
+
+
+def test_ports_per_host():
+    inventory: Inventory = {
+        "base_port": 9000,
+        "nodes": [node("a", 80), node("b", 80)],
+    }
+
+    placements = planner.plan(
+        [spec("m1", 30), spec("m2", 25), spec("m3", 20), spec("m4", 5)], inventory
+    )
+    ports = {p["name"]: (p["host"], p["port"]) for p in placements}
+    # Nodes fill up in order, m3 no longer fits next to m1 and m2
+    assert ports == {
+        "m1": ("a", 9000),
+        "m2": ("a", 9001),
+        "m3": ("b", 9000),
+        "m4": ("a", 9002),
+    }
+
+
+def test_utilization_never_overcommits():
+    inventory: Inventory = {"nodes": [node("a", 24)]}
+
+    # Each needs 7.95 GiB = 0.331 of the GPU, rounded up to 0.34. Three fit by
+    # the estimate but would ask vllm for 1.02 of the GPU.
+    placements = planner.plan([spec(f"m{i}", 5.45) for i in range(2)], inventory)
+    assert [p["gpu_memory_utilization"] for p in placements] == [0.34, 0.34]
+
+    with pytest.raises(ValueError):
+        planner.plan([spec(f"m{i}", 5.45) for i in range(3)], inventory)
+
+
+def test_mixed_size_group_refused():
+    inventory: Inventory = {"nodes": [node("a", 24, 32)]}
+
+    # Needs both GPUs, but one fraction can not fit a 24 and a 32 GB card
+    with pytest.raises(ValueError):
+        planner.plan([spec("m", 36)], inventory)
+
+    (p,) = planner.plan([spec("m", 20)], inventory)
+    assert p["gpus"] == [0]
+
+
+def test_launch_plan(monkeypatch):
+    monkeypatch.setattr(
+        planner,
+        "merged_options",
+        lambda name: {
+            "enable-prefix-caching": {
+                "name": "enable-prefix-caching",
+                "values": [None],
+                "args": [[]],
+                "source": "common.conf",
+                "valid": True,
+            },
+            "port": {
+                "name": "port",
+                "values": ["1234"],
+                "args": [["1234"]],
+                "source": "common.conf",
+                "valid": True,
+            },
+        },
+    )
+
+    inventory: Inventory = {"nodes": [node("a", 24, 24, 24, 24)]}
+    (placement,) = planner.plan([spec("m", 30)], inventory)
+    plan = planner.launch_plan(placement, {"name": "m", "path": "/models/m"})
+
+    assert plan["env"] == {"CUDA_VISIBLE_DEVICES": "0,1", "MODEL": "/models/m"}
+    assert plan["argv"] == [
+        "vllm",
+        "serve",
+        "/models/m",
+        "--enable-prefix-caching",
+        "--port",
+        "8000",
+        "--tensor-parallel-size",
+        "2",
+        "--gpu-memory-utilization",
+        str(placement["gpu_memory_utilization"]),
+        "--max-model-len",
+        "8192",
+    ]
@@ -0,0 +1,138 @@
+import json
+import os
+
+import pytest
+
+import launcher
+import presets
+
+VALID_ARGS_FILE = os.path.join(os.path.dirname(__file__), "..", "VLLM_VALID_ARGS.txt")
+
+
+def names(ps: list[presets.Preset]) -> list[str]:
+    return [p["name"] for p in ps]
+
+
+@pytest.mark.parametrize(
+    "model, size",
+    [
+        ("Qwen/Qwen2.5-0.5B-Instruct", 0.5),
+        ("Qwen/Qwen2.5-72B-Instruct", 72.0),
+        ("gemma-2-27b-it-Q4_K_M.gguf", 27.0),
+        ("meta-llama/Llama-3.2-1B-Instruct", 1.0),
+        ("Qwen/Qwen2.5-Coder-7B-Instruct-AWQ", 7.0),
+        ("mistralai/Mistral-Nemo-Instruct-2407", None),
+    ],
+)
+def test_size_of(model, size):
+    assert presets.size_of(model) == size
+
+
+def test_presets_of_draft_size(tmp_path):
+    assert names(presets.presets_of("Qwen/Qwen2.5-7B-Instruct", str(tmp_path))) == [
+        "draft",
+        "draft-fp8",
+        "ngram",
+        "fp8",
+        "kv-fp8",
+    ]
+
+    # Already the draft model, or not bigger than it
+    for model in [
+        "Qwen/Qwen2.5-0.5B-Instruct",
+        "Qwen/Qwen2.5-0.5B",
+        "google/gemma-2-2b",
+    ]:
+        assert names(presets.presets_of(model, str(tmp_path))) == [
+            "ngram",
+            "fp8",
+            "kv-fp8",
+        ]
+
+
+def test_presets_of_quantized(tmp_path):
+    gguf = tmp_path / "Qwen2.5-7B-Instruct-Q4_K_M.gguf"
+    unquantized = ["draft", "ngram", "kv-fp8"]
+    assert names(presets.presets_of(gguf.name, str(gguf))) == unquantized
+
+    awq = tmp_path / "Qwen2.5-7B-Instruct-AWQ"
+    awq.mkdir()
+    (awq / "config.json").write_text(json.dumps({"quantization_config": {}}))
+    assert names(presets.presets_of(awq.name, str(awq))) == unquantized
+
+
+def test_preset_opts():
+    by_name = {p["name"]: p for p in presets.presets_of("Qwen2.5-7B", "/m/x")}
+
+    assert presets.preset_opts(by_name["draft-fp8"], "/m") == {
+        "speculative-model": ["/m/Qwen/Qwen2.5-0.5B-Instruct"],
+        "num-speculative-tokens": ["5"],
+        "quantization": ["fp8"],
+        "kv-cache-dtype": ["fp8"],
+    }
+    assert presets.preset_opts(by_name["ngram"], "/m") == {
+        "speculative-model": ["[ngram]"],
+        "ngram-prompt-lookup-max": ["4"],
+        "num-speculative-tokens": ["4"],
+    }
+    assert presets.preset_opts(by_name["kv-fp8"], "/m") == {"kv-cache-dtype": ["fp8"]}
+
+
+@pytest.fixture
+def configs(tmp_path, monkeypatch):
+    monkeypatch.setattr(launcher, "CONFIG_PATH", str(tmp_path))
+    monkeypatch.setattr(
+        presets, "load_valid_args", lambda: launcher.load_valid_args(VALID_ARGS_FILE)
+    )
+    return tmp_path
+
+
+def test_apply_keeps_other_lines(configs, tmp_path):
+    config = configs / "Qwen_Qwen2_5-7B-Instruct"
+    config.write_text(
+        "# long context for RAG\n"
+        "max-model-len 32768\n"
+        "\n"
+        "speculative-config {}\n"
+        "kv-cache-dtype\tauto\n"
+        "# lora-modules a=/x\n"
+    )
+
+    p = presets.resolve("Qwen/Qwen2.5-7B-Instruct", "ngram", str(tmp_path))
+    assert p is not None
+    presets.apply("Qwen/Qwen2.5-7B-Instruct", p)
+
+    assert config.read_text() == (
+        "# long context for RAG\n"
+        "max-model-len 32768\n"
+        "\n"
+        "# lora-modules a=/x\n"
+        "speculative-model '[ngram]'\n"
+        "ngram-prompt-lookup-max 4\n"
+        "num-speculative-tokens 4\n"
+    )
+
+
+def test_apply_needs_draft(configs, tmp_path):
+    model = "Qwen/Qwen2.5-7B-Instruct"
+    p = presets.resolve(model, "draft", str(tmp_path))
+    assert p is not None
+
+    with pytest.raises(FileNotFoundError, match="dl.py"):
+        presets.apply(model, p, str(tmp_path))
+    assert not (configs / "Qwen_Qwen2_5-7B-Instruct").exists()
+
+    (tmp_path / "Qwen" / "Qwen2.5-0.5B-Instruct").mkdir(parents=True)
+    presets.apply(model, p, str(tmp_path))
+    assert "speculative-model" in (configs / "Qwen_Qwen2_5-7B-Instruct").read_text()
+
+
+def test_auto_needs_margin(tmp_path, monkeypatch):
+    results = {"m-7B": {"ngram": {"speedup": 1.02}, "kv-fp8": {"speedup": 0.8}}}
+    monkeypatch.setattr(presets, "load_results", lambda: results)
+
+    assert presets.resolve("m-7B", "auto", str(tmp_path)) is None
+
+    results["m-7B"]["kv-fp8"]["speedup"] = 1.2
+    p = presets.resolve("m-7B", "auto", str(tmp_path))
+    assert p is not None and p["name"] == "kv-fp8"
@@ -0,0 +1,114 @@
+import json
+
+import pytest
+
+import session
+from session import ChatSession
+
+
+class Backend:
+    ENDPOINTS = {"chat_completion": "http://localhost:8000/v1/chat/completions"}
+    HEADER = {"Content-Type": "application/json"}
+
+
+class Response:
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+def reply(content):
+    message = {"role": "assistant", "content": content}
+    return Response({"choices": [{"message": message}]})
+
+
+@pytest.fixture
+def posted(monkeypatch):
+    """Requests sent by the session, answered with the queued responses."""
+    requests: list[dict] = []
+    responses: list = []
+
+    def post(url, headers, data):
+        requests.append(json.loads(data))
+        resp = responses.pop(0)
+        if isinstance(resp, Exception):
+            raise resp
+        return resp
+
+    monkeypatch.setattr(session.requests, "post", post)
+    return requests, responses
+
+
+def test_body():
+    chat = ChatSession(Backend(), "model")
+    assert json.loads(chat.body()) == {"model": "model", "messages": []}
+
+    chat.add("system", "Be brief.")
+    chat.add("user", 'Quotes " and \\ and ünïcödé and \ud800')
+    expected = {
+        "model": "model",
+        "messages": [
+            {"role": "system", "content": "Be brief."},
+            {"role": "user", "content": 'Quotes " and \\ and ünïcödé and \ud800'},
+        ],
+    }
+    assert json.loads(chat.body()) == expected
+
+    chat = ChatSession(Backend(), "model", temperature=0.7, max_tokens=16)
+    chat.add("user", "Hi")
+    assert json.loads(chat.body(max_tokens=32, seed=1)) == {
+        "model": "model",
+        "messages": [{"role": "user", "content": "Hi"}],
+        "temperature": 0.7,
+        "max_tokens": 32,
+        "seed": 1,
+    }
+    # Overrides are per call
+    assert json.loads(chat.body())["max_tokens"] == 16
+
+
+def test_pop_restores_prefix():
+    chat = ChatSession(Backend(), "model")
+    empty = bytes(chat.body())
+    chat.add("user", "Hi")
+    one = bytes(chat.body())
+
+    chat.add("assistant", "Hello")
+    assert chat.pop() == {"role": "assistant", "content": "Hello"}
+    assert chat.body() == one
+    chat.pop()
+    assert chat.body() == empty
+    assert chat.messages == []
+
+
+def test_chat(posted):
+    requests, responses = posted
+    chat = ChatSession(Backend(), "model")
+
+    responses.append(reply("Hello"))
+    assert chat.chat("Hi") == "Hello"
+    assert requests[-1]["messages"] == [{"role": "user", "content": "Hi"}]
+    assert chat.messages[-1] == {"role": "assistant", "content": "Hello"}
+    before = bytes(chat.body())
+
+    # Tool call or refusal, the turn leaves no trace
+    responses.append(reply(None))
+    assert chat.chat("Call a tool") is None
+    assert chat.body() == before
+
+    responses.append(ConnectionError("refused"))
+    with pytest.raises(ConnectionError):
+        chat.chat("Again")
+    assert chat.body() == before
+
+    responses.append(Response({"error": "overloaded"}))
+    with pytest.raises(KeyError):
+        chat.chat("Again")
+    assert chat.body() == before
+
+    responses.append(reply("Sure"))
+    assert chat.chat("Again") == "Sure"
+    roles = [m["role"] for m in requests[-1]["messages"]]
+    assert roles == ["user", "assistant", "user"]
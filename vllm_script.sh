@@ -6,8 +6,8 @@ CONFIG_PATH="/home/ubuntu/configs"
 COMMON_CONFIG_PATH="/home/ubuntu/vllm_server_scripts/common.conf"
 
 VALID_ARGS_FILE="/home/ubuntu/vllm_server_scripts/VLLM_VALID_ARGS.txt"
-LOG_FILE="/home/ubuntu/vllm.log"
-# TODO: LOG PATH
+PRESETS_SCRIPT="/home/ubuntu/vllm_server_scripts/presets.py"
+LAUNCHER_SCRIPT="/home/ubuntu/vllm_server_scripts/launcher.py"
 
 # Create file/path if not exists
 if [[ ! -f $COMMON_CONFIG_PATH ]]; then
@@ -16,11 +16,9 @@ fi
 mkdir -p $MODEL_PATH
 mkdir -p $CONFIG_PATH
 
-_pwd=$(pwd)
-
-STOP=""
 MODEL_NAMES=()
 MODEL_PATHS=()
+COMMON_CONFIG=""
 
 # Get config path given the model name
 config_of()
@@ -35,57 +33,21 @@ config_of()
     echo "$config_path"
 }
 
-add_models_to_list()
+# List models and the common config in a single python run, the empty line
+# separates them
+load_models()
 {
-    if [ -d "$1" ]; then
-        r1=$(realpath $1)
-        # secho $r1 "Got folder $1, will iterate:"
-        cd $1
-
-        for file in *; do
-            if [[ $STOP == "yes" ]]; then
-                STOP=""
-                # echo "Stop signal, will stop."
-                break
-            fi
-
-            add_models_to_list $file
+    local mdl_name
+    local mdl_path
+    {
+        while IFS=$'\t' read -r mdl_name mdl_path && [[ -n $mdl_name ]]; do
+            MODEL_NAMES+=("$mdl_name")
+            MODEL_PATHS+=("$mdl_path")
         done
-
-        cd ..
-    fi
-
-    # Early stopping for safetensors
-    if [[ $1 == model*.safetensors ]]; then
-        r1=$(realpath $1)
-        # secho $r1 "Got safetensors file $1"
-        d1=$(dirname "$r1")
-        d2=$(dirname "$d1")
-
-        mdl_name="$(basename "$d2")/$(basename "$d1")"
-
-        n=${#MODEL_NAMES[@]}
-        MODEL_NAMES[$n]=$mdl_name
-        MODEL_PATHS[$n]=$d1
-
-        STOP="yes"
-    fi
-
-    # GGUF
-    if [[ $1 == *.gguf ]]; then
-        r1=$(realpath $1)
-        # secho $r1 "Got gguf file $1"
-
-        n=${#MODEL_NAMES[@]}
-        MODEL_NAMES[$n]=$1
-        MODEL_PATHS[$n]=$r1
-    fi
+        COMMON_CONFIG=$(cat)
+    } < <(python "$LAUNCHER_SCRIPT" list --show "$COMMON_CONFIG_PATH")
 }
 
-# List models
-add_models_to_list $MODEL_PATH
-cd $_pwd
-
 #### FOR PRINTING
 print_models()
 {
@@ -99,23 +61,7 @@ print_models()
 
 print_config()
 {
-    if [ ! -s "$1" ]; then
-        # Empty file
-        echo "  (Defaults)"
-        return
-    fi
-
-    # Contents
-    while read line; do
-
-        name=$(echo "$line" | cut -d' ' -f1)
-        grep -q "$name" "$VALID_ARGS_FILE"
-
-        if [ $? -ne 0 ]; then
-            line="$line (UNKNOWN ARGUMENT!!!)"
-        fi
-        echo "  $line"
-    done < $1
+    python "$LAUNCHER_SCRIPT" show "$1"
 }
 
 set_model_in_env()
@@ -130,60 +76,14 @@ set_model_in_env()
 }
 
 #### FOR RUNNING
-config_opts()
-{
-    local option_file="$1"
-    local escape_quotes="$2"
-
-    local line
-    local opts
-    opts=""
-
-    while read line; do
-        if [[ -n $line ]]; then
-            # Escape double quotes and append the option
-            # opts="$opts --$line"
-            if [[ -n $escape_quotes ]]; then
-                escaped_line=$(printf '%s' "$line" | sed 's/"/\\"/g')
-                opts="$opts --$escaped_line"
-            else
-                opts="$opts --$line"
-            fi
-        fi
-    done < "$option_file"
-    echo "$opts"
-}
-
 serve_model()
 {
-    local model_path="$1"
-    local config_path="$2"
-    local options
-
-    export MODEL="$model_path"
-    trap "unset MODEL" EXIT
-
-    options=$(config_opts "$config_path")
-    common_options=$(config_opts "$COMMON_CONFIG_PATH")
-
-    # if [[ -z $options ]]; then
-    #     vllm serve "$model_path" | tee "$LOG_FILE"
-    # else
-    #     vllm serve "$model_path" $options | tee "$LOG_FILE"
-    # fi
+    local model_name="$1"
 
     if [[ $NO_LOG == "yes" ]]; then
-        if [[ -z $options ]]; then
-            vllm serve "$model_path" $common_options
-        else
-            vllm serve "$model_path" $options $common_options
-        fi
+        python "$LAUNCHER_SCRIPT" serve --model "$model_name" --no-log
     else
-        if [[ -z $options ]]; then
-            vllm serve "$model_path" $common_options | tee "$LOG_FILE"
-        else
-            vllm serve "$model_path" $options $common_options | tee "$LOG_FILE"
-        fi
+        python "$LAUNCHER_SCRIPT" serve --model "$model_name"
     fi
 }
 
@@ -196,7 +96,7 @@ start()
     local sel
 
     echo "Common Settings:"
-    print_config "$COMMON_CONFIG_PATH"
+    echo "$COMMON_CONFIG"
     echo ""
 
     echo "Select action"
@@ -212,6 +112,7 @@ start()
                 ;;
             "Edit Common Config")
                 vi $COMMON_CONFIG_PATH
+                COMMON_CONFIG=$(print_config "$COMMON_CONFIG_PATH")
                 start
                 break
                 ;;
@@ -264,13 +165,13 @@ finalize_serve()
 
     echo ""
     echo "Select action"
-    select sel in "Serve" "Edit Config"; do
+    select sel in "Serve" "Edit Config" "Apply Preset"; do
         case $sel in
             Serve)
                 trap "exit" SIGINT
 
                 set_model_in_env "$model_path"
-                serve_model "$model_path" "$config_path"
+                serve_model "$model_name"
 
                 exit
                 ;;
@@ -278,10 +179,29 @@ finalize_serve()
                 vi $(config_of $model_name)
                 finalize_serve
                 ;;
+            "Apply Preset")
+                select_preset "$model_name"
+                finalize_serve
+                ;;
         esac
     done
 }
 
+select_preset()
+{
+    local model_name="$1"
+    local preset
+
+    # Shows the presets of the model family with their measured speedup
+    python "$PRESETS_SCRIPT" list "$model_name"
+    read -p "Preset (auto = best measured): " preset
+
+    if [[ -n $preset ]]; then
+        python "$PRESETS_SCRIPT" apply "$model_name" "$preset"
+        read -p "Press enter to continue"
+    fi
+}
+
 # Other args
 # TODO: detect if invalid argument is passed
 if [[ $1 == "--no-log" ]]; then
@@ -293,33 +213,20 @@ fi
 if [[ $1 == "" ]]; then
     # interactive mode if no args
 
+    load_models
     start
 else
 
-    SEL=$(echo ${MODEL_NAMES[@]} | tr ' ' '\n' | fzf --query "$1" --select-1 --exit-0)
-    ind=$(echo "${MODEL_NAMES[@]}" | tr ' ' '\n' | grep -n "^$SEL$" | cut -d: -f1)
-    ind=$((ind - 1))
-
-    model_path=${MODEL_PATHS[$ind]}
-    config_path=$(config_of "$SEL")
-    options=$(config_opts "$config_path" "yes")
-    common_options=$(config_opts "$COMMON_CONFIG_PATH" "yes")
+    SEL=$(python "$LAUNCHER_SCRIPT" select "$1") || exit 1
+    model_name=$(echo "$SEL" | cut -f1)
+    model_path=$(echo "$SEL" | cut -f2)
     set_model_in_env "$model_path"
 
     tmux new-session -d -s vllm
 
-    tmux_cmd="vllm serve $model_path"
-    if [[ -n $options ]]; then
-        tmux_cmd+=" $options"
-    fi
-
-    echo "Common options: $common_options"
-    if [[ -n $common_options ]]; then
-        tmux_cmd+=" $common_options"
-    fi
-
-    if ! [[ $NO_LOG == "yes" ]]; then
-        tmux_cmd+=" | tee $LOG_FILE"
+    tmux_cmd="python $LAUNCHER_SCRIPT serve --model '$model_name'"
+    if [[ $NO_LOG == "yes" ]]; then
+        tmux_cmd+=" --no-log"
     fi
 
     tmux send-keys -t vllm "$tmux_cmd" C-m